@@ -4,20 +4,34 @@ Telegram bot with daily vinyl suggestion scheduler.
 Commands:
   /start   – welcome message
   /suggest – request a suggestion right now
-  /history – show last 10 suggestions
+  /history – browse past suggestions, 10 per page
+  /search  – full-text search over past suggestions
+  /export  – download the full history as CSV or JSON
 """
-import asyncio
-import datetime
-import logging
-from logging.handlers import RotatingFileHandler
-
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
-from telegram.ext import Application, CommandHandler, CallbackQueryHandler, ContextTypes
-from telegram.constants import ParseMode
-
-import config
-import database
-import recommender
+import time
+
+# Taken before every other import, so the startup budget includes loading them
+_STARTED_AT = time.monotonic()
+
+import asyncio  # noqa: E402
+import contextlib  # noqa: E402
+import csv  # noqa: E402
+import datetime  # noqa: E402
+import json  # noqa: E402
+import logging  # noqa: E402
+import os  # noqa: E402
+import re  # noqa: E402
+import tempfile  # noqa: E402
+from logging.handlers import RotatingFileHandler  # noqa: E402
+
+from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup  # noqa: E402
+from telegram.ext import Application, CommandHandler, CallbackQueryHandler, ContextTypes  # noqa: E402
+from telegram.constants import ParseMode  # noqa: E402
+from telegram.error import TelegramError  # noqa: E402
+from telegram.helpers import escape_markdown  # noqa: E402
+
+import config  # noqa: E402
+import database  # noqa: E402
 
 _handler = RotatingFileHandler(
     config.LOG_PATH,
@@ -32,11 +46,52 @@ logging.basicConfig(
 )
 log = logging.getLogger(__name__)
 
+# Only commands (messages) and rating buttons (callback queries) are handled
+ALLOWED_UPDATES = [Update.MESSAGE, Update.CALLBACK_QUERY]
+
+# Serialises the scheduled daily job and the catch-up paths so none of them can
+# send today's suggestion while another is still generating it.
+_daily_lock = asyncio.Lock()
+
+
+# Telegram rate-limits message edits; never update the progress message more often than this
+PROGRESS_MIN_INTERVAL = 2.0
+
+
+def _get_suggestion(on_progress=None, strong: bool = False) -> dict | None:
+    """Run the recommender, importing it (and the Anthropic SDK) on first use."""
+    import recommender
+
+    return recommender.get_suggestion(on_progress=on_progress, strong=strong)
+
+
+def _get_suggestions(count: int) -> list[dict]:
+    import recommender
+
+    return recommender.get_suggestions(count)
+
 
 # ---------------------------------------------------------------------------
 # Message formatting
 # ---------------------------------------------------------------------------
 
+_MD_SPECIAL = re.compile(r"([_*`\[])")
+
+
+def md_entity(text: str, marker: str) -> str:
+    """
+    Wrap `text` in a legacy-Markdown entity (`*` bold, `_` italic). Telegram
+    doesn't allow escapes inside an entity, so the entity is closed and reopened
+    around each escaped special character.
+    """
+    parts = []
+    for part in _MD_SPECIAL.split(text):
+        if not part:
+            continue
+        parts.append(f"\\{part}" if _MD_SPECIAL.fullmatch(part) else f"{marker}{part}{marker}")
+    return "".join(parts)
+
+
 def format_suggestion(s: dict) -> str:
     year_str = f" ({s['year']})" if s.get("year") else ""
     fmt_emoji = "📼" if s.get("format", "").lower() == "cassette" else "🎵"
@@ -46,8 +101,8 @@ def format_suggestion(s: dict) -> str:
     rarity_label = s.get("rarity_label", "")
 
     return (
-        f"{fmt_emoji} *{s['artist']}* – _{s['title']}{year_str}_\n\n"
-        f"{s['why']}\n\n"
+        f"{fmt_emoji} {md_entity(s['artist'], '*')} – {md_entity(s['title'] + year_str, '_')}\n\n"
+        f"{escape_markdown(s['why'])}\n\n"
         f"*Rarity:* {rarity_bar} {rarity_label}\n"
         f"_{have} collectors own it · {want} want it_\n\n"
         f"🔗 [View on Discogs]({s['discogs_url']})"
@@ -69,6 +124,53 @@ def rated_keyboard(rating: int) -> InlineKeyboardMarkup:
     ])
 
 
+# Telegram rejects messages over 4096 characters; leave some headroom
+DIGEST_MAX_CHARS = 4000
+
+
+def format_digest(suggestions: list[dict]) -> list[tuple[str, list[dict], int]]:
+    """
+    Split the digest into messages that each fit DIGEST_MAX_CHARS. Returns
+    (text, picks in that message, number of its first pick) per message.
+    """
+    chunks = []
+    text = f"📬 *You missed {len(suggestions)} daily picks — here they are:*"
+    picks: list[dict] = []
+    start = 1
+    for i, s in enumerate(suggestions, 1):
+        item = f"*{i}.* {format_suggestion(s)}"
+        if picks and len(text) + 2 + len(item) > DIGEST_MAX_CHARS:
+            chunks.append((text, picks, start))
+            text, picks, start = item, [], i
+        else:
+            text = f"{text}\n\n{item}"
+        picks.append(s)
+    chunks.append((text, picks, start))
+    return chunks
+
+
+def digest_keyboard(suggestions: list[dict], start: int = 1) -> InlineKeyboardMarkup:
+    """A label row plus a rating row per record, so each can be rated separately."""
+    rows = []
+    for i, s in enumerate(suggestions, start):
+        label = f"{i}. {s['artist']} – {s['title']}"
+        rows.append([InlineKeyboardButton(label[:60], callback_data="noop")])
+        rows.append(rating_keyboard(s["discogs_id"]).inline_keyboard[0])
+    return InlineKeyboardMarkup(rows)
+
+
+def mark_rated(markup: InlineKeyboardMarkup | None, discogs_id: str, rating: int) -> InlineKeyboardMarkup:
+    """Replace the rating row for `discogs_id` with the rated summary, keeping any other rows."""
+    rated_row = rated_keyboard(rating).inline_keyboard[0]
+    if markup is None:
+        return InlineKeyboardMarkup([rated_row])
+    prefix = f"rate:{discogs_id}:"
+    return InlineKeyboardMarkup([
+        rated_row if any((b.callback_data or "").startswith(prefix) for b in row) else row
+        for row in markup.inline_keyboard
+    ])
+
+
 # ---------------------------------------------------------------------------
 # Bot command handlers
 # ---------------------------------------------------------------------------
@@ -79,14 +181,46 @@ async def cmd_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
         "Every day I'll suggest a vinyl or cassette record based on your Discogs taste\\.\n\n"
         "Commands:\n"
         "  /suggest – get a suggestion right now\n"
-        "  /history – see the last 10 suggestions",
+        "  /history – browse past suggestions\n"
+        "  /search – search past suggestions\n"
+        "  /export – download your history as CSV or JSON",
         parse_mode=ParseMode.MARKDOWN_V2,
     )
 
 
+async def _relay_progress(msg, updates: asyncio.Queue):
+    """Mirror recommender progress into `msg`, at most once per PROGRESS_MIN_INTERVAL.
+    Only the latest update is shown; intermediate ones are dropped."""
+    shown = None
+    while True:
+        text = await updates.get()
+        while not updates.empty():
+            text = updates.get_nowait()
+        if text != shown:
+            try:
+                await msg.edit_text(f"🔍 {text}")
+                shown = text
+            except TelegramError as e:
+                log.debug(f"Progress update failed: {e}")
+        await asyncio.sleep(PROGRESS_MIN_INTERVAL)
+
+
 async def cmd_suggest(update: Update, context: ContextTypes.DEFAULT_TYPE):
     msg = await update.message.reply_text("🔍 Analysing your taste… hang tight!")
-    suggestion = await asyncio.to_thread(recommender.get_suggestion)
+
+    # The recommender runs in a worker thread; hand its progress back to the event loop
+    loop = asyncio.get_running_loop()
+    updates: asyncio.Queue = asyncio.Queue()
+    relay = asyncio.create_task(_relay_progress(msg, updates))
+    try:
+        suggestion = await asyncio.to_thread(
+            _get_suggestion, lambda text: loop.call_soon_threadsafe(updates.put_nowait, text)
+        )
+    finally:
+        relay.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await relay
+
     if suggestion is None:
         await msg.edit_text("😕 Couldn't find a good suggestion right now. Try again later.")
         return
@@ -96,6 +230,8 @@ async def cmd_suggest(update: Update, context: ContextTypes.DEFAULT_TYPE):
         suggestion["title"],
         suggestion.get("format", ""),
         suggestion.get("genre", ""),
+        suggestion.get("styles", []),
+        suggestion.get("label", ""),
     )
     await msg.edit_text(
         format_suggestion(suggestion),
@@ -104,18 +240,102 @@ async def cmd_suggest(update: Update, context: ContextTypes.DEFAULT_TYPE):
     )
 
 
+HISTORY_PAGE_SIZE = 10
+
+
+def format_history(items: list[dict], heading: str) -> str:
+    """Markdown list of history rows. `heading` and all row fields are escaped."""
+    lines = [f"{md_entity(heading, '*')}\n"]
+    for h in items:
+        date = h["sent_at"][:10]
+        rating_str = f" {'★' * h['rating']}" if h.get("rating") else ""
+        fmt_str = escape_markdown(f" [{h['format']}]") if h.get("format") else ""
+        artist = md_entity(h["artist"] or "", "*")
+        title = md_entity(h["title"] or "", "_")
+        lines.append(f"• {artist} – {title}{fmt_str}{rating_str} ({date})")
+    return "\n".join(lines)
+
+
+def history_keyboard(page: dict) -> InlineKeyboardMarkup | None:
+    """Prev/next buttons carrying the id of the first/last row as the keyset cursor."""
+    buttons = []
+    if page["has_newer"]:
+        buttons.append(InlineKeyboardButton("« Newer", callback_data=f"hist:newer:{page['items'][0]['id']}"))
+    if page["has_older"]:
+        buttons.append(InlineKeyboardButton("Older »", callback_data=f"hist:older:{page['items'][-1]['id']}"))
+    return InlineKeyboardMarkup([buttons]) if buttons else None
+
+
 async def cmd_history(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    history = database.get_history(limit=10)
-    if not history:
+    page = database.get_history_page(limit=HISTORY_PAGE_SIZE)
+    if not page["items"]:
         await update.message.reply_text("No suggestions sent yet.")
         return
-    lines = ["*Recent suggestions:*\n"]
-    for i, h in enumerate(history, 1):
-        date = h["sent_at"][:10]
-        rating_str = f" {'★' * h['rating']}" if h.get("rating") else ""
-        fmt_str = f" [{h['format']}]" if h.get("format") else ""
-        lines.append(f"{i}. *{h['artist']}* – _{h['title']}_{fmt_str}{rating_str} ({date})")
-    await update.message.reply_text("\n".join(lines), parse_mode=ParseMode.MARKDOWN)
+    await update.message.reply_text(
+        format_history(page["items"], "Recent suggestions:"),
+        parse_mode=ParseMode.MARKDOWN,
+        reply_markup=history_keyboard(page),
+    )
+
+
+async def handle_history_page(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    await query.answer()
+
+    _, direction, cursor = query.data.split(":")
+    page = database.get_history_page(int(cursor), direction, limit=HISTORY_PAGE_SIZE)
+    if not page["items"]:
+        return
+    await query.edit_message_text(
+        format_history(page["items"], "Suggestions:"),
+        parse_mode=ParseMode.MARKDOWN,
+        reply_markup=history_keyboard(page),
+    )
+
+
+async def cmd_search(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    text = " ".join(context.args)
+    if not text:
+        await update.message.reply_text("Usage: /search <artist, title or genre>")
+        return
+    results = database.search_history(text, limit=HISTORY_PAGE_SIZE)
+    if not results:
+        await update.message.reply_text(f"No past suggestions match “{text}”.")
+        return
+    await update.message.reply_text(
+        format_history(results, f"Matches for “{text}”:"),
+        parse_mode=ParseMode.MARKDOWN,
+    )
+
+
+def _write_export(fmt: str) -> str:
+    """Stream the whole history into a temp file, one row at a time. Returns its path."""
+    fd, path = tempfile.mkstemp(prefix="vinylbot-history-", suffix=f".{fmt}")
+    with os.fdopen(fd, "w", newline="", encoding="utf-8") as f:
+        if fmt == "csv":
+            writer = csv.DictWriter(f, fieldnames=database.HISTORY_COLUMNS)
+            writer.writeheader()
+            for row in database.iter_history():
+                writer.writerow(row)
+        else:
+            f.write("[")
+            for i, row in enumerate(database.iter_history()):
+                f.write(("," if i else "") + "\n  " + json.dumps(row, ensure_ascii=False))
+            f.write("\n]\n")
+    return path
+
+
+async def cmd_export(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    fmt = (context.args[0].lower() if context.args else "csv")
+    if fmt not in ("csv", "json"):
+        await update.message.reply_text("Usage: /export [csv|json]")
+        return
+    path = await asyncio.to_thread(_write_export, fmt)
+    try:
+        with open(path, "rb") as f:
+            await update.message.reply_document(document=f, filename=f"vinyl-history.{fmt}")
+    finally:
+        os.remove(path)
 
 
 # ---------------------------------------------------------------------------
@@ -133,7 +353,9 @@ async def handle_rating(update: Update, context: ContextTypes.DEFAULT_TYPE):
     rating = int(rating_str)
 
     database.update_rating(discogs_id, rating)
-    await query.edit_message_reply_markup(reply_markup=rated_keyboard(rating))
+    await query.edit_message_reply_markup(
+        reply_markup=mark_rated(query.message.reply_markup, discogs_id, rating)
+    )
     log.info(f"User rated {discogs_id} → {rating}★")
 
 
@@ -141,19 +363,105 @@ async def handle_rating(update: Update, context: ContextTypes.DEFAULT_TYPE):
 # Daily scheduled job (uses built-in JobQueue)
 # ---------------------------------------------------------------------------
 
-async def catchup_check(context: ContextTypes.DEFAULT_TYPE):
-    """Runs every 15 min. If the scheduled time has passed and no suggestion was
-    sent today (e.g. Mac was asleep), send it now."""
-    now = datetime.datetime.now(datetime.timezone.utc)
+def missed_slots(now: datetime.datetime, include_today: bool = False) -> list[datetime.date]:
+    """
+    Daily slots after the latest filled one that still have no suggestion,
+    oldest first and capped at the BACKFILL_MAX_DAYS most recent. Today's slot
+    only counts once its scheduled time has passed, unless include_today is set.
+    """
     scheduled = now.replace(hour=config.DAILY_HOUR, minute=config.DAILY_MINUTE, second=0, microsecond=0)
-    if now >= scheduled and not database.suggestion_sent_today():
-        log.info("Catch-up check: missed today's suggestion — sending now…")
+    today = now.date()
+    last_due = today if include_today or now >= scheduled else today - datetime.timedelta(days=1)
+    last_slot = database.last_slot_date()
+    if last_slot is None:
+        return [today] if last_due == today else []
+    missed = min((last_due - datetime.date.fromisoformat(last_slot)).days, config.BACKFILL_MAX_DAYS)
+    return [last_due - datetime.timedelta(days=i) for i in range(missed - 1, -1, -1)]
+
+
+async def send_missed(context: ContextTypes.DEFAULT_TYPE, include_today: bool = False):
+    """Send whatever was missed: the usual single message for one slot, a digest for more."""
+    now = datetime.datetime.now(datetime.timezone.utc)
+    if not missed_slots(now, include_today):
+        return
+    async with _daily_lock:
+        slots = missed_slots(now, include_today)
+        if len(slots) == 1:
+            log.info(f"Missed the suggestion for {slots[0]} — sending now…")
+            await daily_suggestion(context, slots[0])
+        elif slots:
+            log.info(f"Missed {len(slots)} daily suggestions — sending a backfill digest…")
+            await backfill_digest(context, slots)
+
+
+async def catchup_check(context: ContextTypes.DEFAULT_TYPE):
+    """Runs every 15 min. If scheduled suggestions were missed (e.g. Mac was
+    asleep), send them now."""
+    await send_missed(context)
+
+
+async def startup_catchup(context: ContextTypes.DEFAULT_TYPE):
+    """One-off job shortly after polling starts. If no suggestion was sent today
+    (e.g. the bot was restarted by launchd), catch up without blocking startup."""
+    await send_missed(context, include_today=True)
+
+
+async def backfill_digest(context: ContextTypes.DEFAULT_TYPE, slots: list[datetime.date]):
+    """Generate one suggestion per missed slot in one batched run and send them as
+    a digest (split across messages only if it would exceed Telegram's length limit)."""
+    suggestions = await asyncio.to_thread(_get_suggestions, len(slots))
+    if not suggestions:
+        log.warning("Backfill produced no suggestions.")
+        await context.bot.send_message(
+            chat_id=config.TELEGRAM_CHAT_ID,
+            text="😕 Couldn't catch up on the suggestions you missed. Try /suggest manually.",
+        )
+        return
+    # Picks fill the most recent slots, oldest first. Record each one only once
+    # its message is delivered, so a failed send leaves the later days to be
+    # caught up again instead of losing them.
+    slots = slots[-len(suggestions):]
+    sent = 0
+    for text, picks, start in format_digest(suggestions):
+        try:
+            await context.bot.send_message(
+                chat_id=config.TELEGRAM_CHAT_ID,
+                text=text,
+                parse_mode=ParseMode.MARKDOWN,
+                reply_markup=digest_keyboard(picks, start),
+                disable_web_page_preview=True,
+            )
+        except TelegramError as e:
+            log.error(f"Failed to send backfill digest: {e}")
+            break
+        for suggestion, slot in zip(picks, slots[start - 1:]):
+            database.record_suggestion(
+                suggestion["discogs_id"],
+                suggestion["artist"],
+                suggestion["title"],
+                suggestion.get("format", ""),
+                suggestion.get("genre", ""),
+                suggestion.get("styles", []),
+                suggestion.get("label", ""),
+                slot.isoformat(),
+            )
+        sent += len(picks)
+    log.info(f"Sent backfill digest with {sent}/{len(suggestions)} suggestions")
+
+
+async def scheduled_suggestion(context: ContextTypes.DEFAULT_TYPE):
+    """The run_daily job. Skips if a catch-up already sent today's suggestion."""
+    async with _daily_lock:
+        if database.suggestion_sent_today():
+            log.info("Today's suggestion was already sent — skipping scheduled run.")
+            return
         await daily_suggestion(context)
 
 
-async def daily_suggestion(context: ContextTypes.DEFAULT_TYPE):
+async def daily_suggestion(context: ContextTypes.DEFAULT_TYPE, slot: datetime.date | None = None):
+    """Send one suggestion for `slot` (today's slot if not given)."""
     log.info("Running daily suggestion job…")
-    suggestion = await asyncio.to_thread(recommender.get_suggestion)
+    suggestion = await asyncio.to_thread(_get_suggestion, None, True)
     if suggestion is None:
         log.warning("No suggestion generated today.")
         await context.bot.send_message(
@@ -167,6 +475,9 @@ async def daily_suggestion(context: ContextTypes.DEFAULT_TYPE):
         suggestion["title"],
         suggestion.get("format", ""),
         suggestion.get("genre", ""),
+        suggestion.get("styles", []),
+        suggestion.get("label", ""),
+        slot.isoformat() if slot else None,
     )
     await context.bot.send_message(
         chat_id=config.TELEGRAM_CHAT_ID,
@@ -185,10 +496,16 @@ def main():
     config.validate()
     database.init_db()
 
-    app = Application.builder().token(config.TELEGRAM_BOT_TOKEN).build()
+    builder = Application.builder().token(config.TELEGRAM_BOT_TOKEN)
+    if config.TELEGRAM_BASE_URL:
+        builder = builder.base_url(config.TELEGRAM_BASE_URL)
+    app = builder.build()
     app.add_handler(CommandHandler("start", cmd_start))
     app.add_handler(CommandHandler("suggest", cmd_suggest))
     app.add_handler(CommandHandler("history", cmd_history))
+    app.add_handler(CommandHandler("search", cmd_search))
+    app.add_handler(CommandHandler("export", cmd_export))
+    app.add_handler(CallbackQueryHandler(handle_history_page, pattern=r"^hist:"))
     app.add_handler(CallbackQueryHandler(handle_rating))
 
     # Use the built-in JobQueue — fully integrated with the bot's async event loop
@@ -197,23 +514,44 @@ def main():
         minute=config.DAILY_MINUTE,
         tzinfo=datetime.timezone.utc,
     )
-    app.job_queue.run_daily(daily_suggestion, time=send_time)
+    app.job_queue.run_daily(scheduled_suggestion, time=send_time)
     log.info(f"Daily suggestion scheduled at {config.DAILY_HOUR:02d}:{config.DAILY_MINUTE:02d} UTC")
 
     # Watchdog: every 15 min, catch missed suggestions (e.g. Mac was asleep at scheduled time)
     app.job_queue.run_repeating(catchup_check, interval=900, first=60)
     log.info("Catch-up watchdog scheduled every 15 minutes")
 
-    # Catch-up: if the Mac was asleep at scheduled time, send on startup
+    # Catch-up: if the Mac was asleep at scheduled time, send shortly after startup.
+    # Runs as a job so polling starts first and commands are answered immediately.
+    app.job_queue.run_once(startup_catchup, when=config.STARTUP_CATCHUP_DELAY)
+
     async def post_init(application: Application):
-        if not database.suggestion_sent_today():
-            log.info("No suggestion sent today yet — sending catch-up suggestion…")
-            await daily_suggestion(type("ctx", (), {"bot": application.bot})())
+        elapsed = time.monotonic() - _STARTED_AT
+        if elapsed > config.STARTUP_BUDGET_SECONDS:
+            log.warning(f"Startup took {elapsed:.2f}s (budget {config.STARTUP_BUDGET_SECONDS:.1f}s)")
+        else:
+            log.info(f"Startup took {elapsed:.2f}s")
 
     app.post_init = post_init
 
-    log.info("Bot starting…")
-    app.run_polling(allowed_updates=Update.ALL_TYPES)
+    if config.TELEGRAM_WEBHOOK_URL:
+        # Telegram pushes updates to a local listener; requests without the
+        # matching X-Telegram-Bot-Api-Secret-Token header are rejected.
+        log.info(
+            f"Bot starting in webhook mode on "
+            f"{config.TELEGRAM_WEBHOOK_LISTEN}:{config.TELEGRAM_WEBHOOK_PORT}…"
+        )
+        app.run_webhook(
+            listen=config.TELEGRAM_WEBHOOK_LISTEN,
+            port=config.TELEGRAM_WEBHOOK_PORT,
+            url_path="telegram",
+            webhook_url=f"{config.TELEGRAM_WEBHOOK_URL.rstrip('/')}/telegram",
+            secret_token=config.TELEGRAM_WEBHOOK_SECRET,
+            allowed_updates=ALLOWED_UPDATES,
+        )
+    else:
+        log.info("Bot starting…")
+        app.run_polling(allowed_updates=ALLOWED_UPDATES)
 
 
 if __name__ == "__main__":
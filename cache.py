@@ -0,0 +1,220 @@
+"""
+Compact binary cache for the Discogs library summary.
+
+Layout (all integers little-endian):
+
+  header   magic "VBC\\0", format version (u16), section count (u16), cached_at (f64 epoch)
+  toc      one (name: 4s, offset: u64, length: u64) entry per section
+  STRS     string table: count (u32), count+1 offsets (u32) into a UTF-8 blob, blob
+  IDS_     sorted owned release IDs (i64)
+  KEYS     owned normalized (artist, title) pairs as string-table indices (u32, u32)
+  PROF     profile counters: totals (u32 × 2), then per counter n (u32) + n × (string, count)
+
+The file is memory-mapped and each section is read on its own, so loading the
+owned IDs never touches the string table, labels or styles.
+"""
+import contextlib
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import time
+from array import array
+from collections import Counter
+
+MAGIC = b"VBC\0"
+VERSION = 1
+
+_HEADER = struct.Struct("<4sHHd")
+_TOC_ENTRY = struct.Struct("<4sQQ")
+
+_STRINGS = b"STRS"
+_IDS = b"IDS_"
+_KEYS = b"KEYS"
+_PROFILE = b"PROF"
+
+PROFILE_COUNTERS = ("genres", "styles", "artists", "labels", "decades")
+
+
+def _le(arr: array) -> array:
+    if sys.byteorder == "big":
+        arr.byteswap()
+    return arr
+
+
+def _array(typecode: str, data) -> array:
+    arr = array(typecode)
+    arr.frombytes(data)
+    return _le(arr)
+
+
+# ---------------------------------------------------------------------------
+# Writing
+# ---------------------------------------------------------------------------
+
+def write(path: str, counts: dict[str, Counter], owned_ids: set[str], owned_titles: set[tuple[str, str]]):
+    """Write a cache file atomically (temp file + rename)."""
+    strings: dict[str, int] = {}
+
+    def ref(s: str) -> int:
+        idx = strings.get(s)
+        if idx is None:
+            idx = strings[s] = len(strings)
+        return idx
+
+    ids = array("q", sorted(int(i) for i in owned_ids if i.isdigit()))
+
+    keys = array("I")
+    for artist, title in owned_titles:
+        keys.append(ref(artist))
+        keys.append(ref(title))
+
+    totals = counts["totals"]
+    profile = array("I", [totals["collection"], totals["wantlist"]])
+    for name in PROFILE_COUNTERS:
+        counter = counts[name]
+        profile.append(len(counter))
+        for value, n in counter.items():
+            profile.append(ref(value))
+            profile.append(n)
+
+    blob = bytearray()
+    offsets = array("I", [0])
+    for s in strings:  # dicts keep insertion order, i.e. index order
+        blob += s.encode("utf-8")
+        offsets.append(len(blob))
+    string_table = struct.pack("<I", len(strings)) + _le(offsets).tobytes() + bytes(blob)
+
+    sections = [
+        (_STRINGS, string_table),
+        (_IDS, _le(ids).tobytes()),
+        (_KEYS, _le(keys).tobytes()),
+        (_PROFILE, _le(profile).tobytes()),
+    ]
+
+    offset = _HEADER.size + _TOC_ENTRY.size * len(sections)
+    toc = b""
+    for name, data in sections:
+        toc += _TOC_ENTRY.pack(name, offset, len(data))
+        offset += len(data)
+
+    # A unique temp file per writer, so two concurrent refreshes never interleave
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", prefix=".cache-", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(_HEADER.pack(MAGIC, VERSION, len(sections), time.time()))
+            f.write(toc)
+            for _, data in sections:
+                f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(tmp_path)
+        raise
+
+
+# ---------------------------------------------------------------------------
+# Reading
+# ---------------------------------------------------------------------------
+
+def cached_at(path: str) -> float | None:
+    """Return the cache timestamp (epoch seconds), or None if missing or not a valid cache."""
+    try:
+        with open(path, "rb") as f:
+            magic, version, _, ts = _HEADER.unpack(f.read(_HEADER.size))
+    except (OSError, struct.error):
+        return None
+    if magic != MAGIC or version != VERSION:
+        return None
+    return ts
+
+
+class _Reader:
+    """Memory-mapped view of a cache file with lazy access to individual sections."""
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            self._toc = self._read_toc(path)
+        except (ValueError, struct.error):
+            self._mm.close()
+            raise
+        self._offsets = None
+
+    def _read_toc(self, path: str) -> dict[bytes, tuple[int, int]]:
+        magic, version, count, _ = _HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"Not a v{VERSION} cache file: {path}")
+        toc = {}
+        for i in range(count):
+            name, offset, length = _TOC_ENTRY.unpack_from(self._mm, _HEADER.size + i * _TOC_ENTRY.size)
+            if offset + length > len(self._mm):
+                raise ValueError(f"Truncated cache file: {path} (section {name!r} ends past EOF)")
+            toc[name] = (offset, length)
+        return toc
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._mm.close()
+
+    def section(self, name: bytes) -> bytes:
+        """Copy out a single section; the rest of the file is never read."""
+        offset, length = self._toc[name]
+        return self._mm[offset:offset + length]
+
+    def string(self, idx: int) -> str:
+        if self._offsets is None:
+            table_start = self._toc[_STRINGS][0]
+            (count,) = struct.unpack_from("<I", self._mm, table_start)
+            self._blob_start = table_start + 4 + 4 * (count + 1)
+            self._offsets = _array("I", self._mm[table_start + 4:self._blob_start])
+        start = self._blob_start + self._offsets[idx]
+        end = self._blob_start + self._offsets[idx + 1]
+        return self._mm[start:end].decode("utf-8")
+
+
+def _read_ids(r: _Reader) -> set[str]:
+    return {str(i) for i in _array("q", r.section(_IDS))}
+
+
+def _read_title_keys(r: _Reader) -> set[tuple[str, str]]:
+    refs = _array("I", r.section(_KEYS))
+    return {(r.string(refs[i]), r.string(refs[i + 1])) for i in range(0, len(refs), 2)}
+
+
+def _read_counts(r: _Reader) -> dict[str, Counter]:
+    data = _array("I", r.section(_PROFILE))
+    counts = {"totals": Counter(collection=data[0], wantlist=data[1])}
+    pos = 2
+    for name in PROFILE_COUNTERS:
+        n = data[pos]
+        pos += 1
+        counter = Counter()
+        for i in range(pos, pos + 2 * n, 2):
+            counter[r.string(data[i])] = data[i + 1]
+        counts[name] = counter
+        pos += 2 * n
+    return counts
+
+
+_SECTION_READERS = {
+    "owned_ids": _read_ids,
+    "owned_titles": _read_title_keys,
+    "counts": _read_counts,
+}
+
+
+def load(path: str, sections=("owned_ids", "owned_titles", "counts")) -> dict:
+    """
+    Open the cache once and decode only the requested sections ("owned_ids",
+    "owned_titles", "counts"). E.g. loading just "owned_ids" never touches the
+    string table.
+    """
+    with _Reader(path) as r:
+        return {name: _SECTION_READERS[name](r) for name in sections}
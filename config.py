@@ -1,4 +1,5 @@
 import os
+import re
 from dotenv import load_dotenv
 
 load_dotenv(os.path.join(os.path.dirname(__file__), ".env"))
@@ -9,16 +10,35 @@ DISCOGS_USERNAME = os.getenv("DISCOGS_USERNAME")
 TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
 TELEGRAM_CHAT_ID = os.getenv("TELEGRAM_CHAT_ID")
 
+# Webhook mode: set TELEGRAM_WEBHOOK_URL to the public HTTPS URL that forwards to
+# the local listener. Leave it empty to use long polling.
+TELEGRAM_WEBHOOK_URL = os.getenv("TELEGRAM_WEBHOOK_URL", "")
+TELEGRAM_WEBHOOK_SECRET = os.getenv("TELEGRAM_WEBHOOK_SECRET", "")
+TELEGRAM_WEBHOOK_LISTEN = os.getenv("TELEGRAM_WEBHOOK_LISTEN", "127.0.0.1")
+TELEGRAM_WEBHOOK_PORT = int(os.getenv("TELEGRAM_WEBHOOK_PORT", 8443))
+# Override the Bot API endpoint, e.g. to point the bot at a local fake server.
+TELEGRAM_BASE_URL = os.getenv("TELEGRAM_BASE_URL", "")
+
 ANTHROPIC_API_KEY = os.getenv("ANTHROPIC_API_KEY")
 
+# Model tiers: the fast model drafts /suggest candidates; the strong model handles
+# the daily pick and takes over after CLAUDE_ESCALATE_AFTER rejected attempts.
+CLAUDE_FAST_MODEL = os.getenv("CLAUDE_FAST_MODEL", "claude-haiku-4-5")
+CLAUDE_STRONG_MODEL = os.getenv("CLAUDE_STRONG_MODEL", "claude-opus-4-6")
+CLAUDE_ESCALATE_AFTER = int(os.getenv("CLAUDE_ESCALATE_AFTER", 2))
+
 DAILY_HOUR = int(os.getenv("DAILY_HOUR", 9))
 DAILY_MINUTE = int(os.getenv("DAILY_MINUTE", 0))
+BACKFILL_MAX_DAYS = int(os.getenv("BACKFILL_MAX_DAYS", 7))  # cap on missed days sent in one catch-up digest
 
 DB_PATH = os.path.join(os.path.dirname(__file__), "suggestions.db")
-CACHE_PATH = os.path.join(os.path.dirname(__file__), "discogs_cache.json")
+CACHE_PATH = os.path.join(os.path.dirname(__file__), "discogs_cache.bin")
 LOG_PATH = os.path.join(os.path.dirname(__file__), "bot.log")
 CACHE_TTL_HOURS = 168  # 1 week
 
+STARTUP_BUDGET_SECONDS = float(os.getenv("STARTUP_BUDGET_SECONDS", 1.0))
+STARTUP_CATCHUP_DELAY = 5  # seconds after polling starts before the catch-up check
+
 def validate():
     required = {
         "DISCOGS_TOKEN": DISCOGS_TOKEN,
@@ -27,6 +47,10 @@ def validate():
         "TELEGRAM_CHAT_ID": TELEGRAM_CHAT_ID,
         "ANTHROPIC_API_KEY": ANTHROPIC_API_KEY,
     }
+    if TELEGRAM_WEBHOOK_URL:
+        required["TELEGRAM_WEBHOOK_SECRET"] = TELEGRAM_WEBHOOK_SECRET
     missing = [k for k, v in required.items() if not v]
     if missing:
         raise EnvironmentError(f"Missing required env vars: {', '.join(missing)}")
+    if TELEGRAM_WEBHOOK_SECRET and not re.fullmatch(r"[A-Za-z0-9_-]{1,256}", TELEGRAM_WEBHOOK_SECRET):
+        raise EnvironmentError("TELEGRAM_WEBHOOK_SECRET must be 1-256 characters of A-Z, a-z, 0-9, _ or -")
@@ -1,5 +1,6 @@
 import sqlite3
 from datetime import datetime
+from typing import Iterator
 from config import DB_PATH
 
 
@@ -24,15 +25,93 @@ def init_db():
             CREATE UNIQUE INDEX IF NOT EXISTS idx_discogs_id
             ON suggestions (discogs_id)
         """)
+        # Keyset pagination walks (sent_at, id) in order
+        conn.execute("""
+            CREATE INDEX IF NOT EXISTS idx_sent_at
+            ON suggestions (sent_at, id)
+        """)
         # Migrate: add columns if upgrading from older schema
-        for col, definition in [("format", "TEXT"), ("rating", "INTEGER"), ("genre", "TEXT")]:
+        for col, definition in [("format", "TEXT"), ("rating", "INTEGER"), ("genre", "TEXT"),
+                                ("styles", "TEXT"), ("label", "TEXT"), ("slot_date", "TEXT")]:
             try:
                 conn.execute(f"ALTER TABLE suggestions ADD COLUMN {col} {definition}")
             except Exception:
                 pass
+        # Migrate: rows from before slot_date stand in for the day they were sent
+        conn.execute("UPDATE suggestions SET slot_date = substr(sent_at, 1, 10) WHERE slot_date IS NULL")
+        # Rating-driven preference model: one running weight per (dimension, value)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS preferences (
+                dimension   TEXT NOT NULL,
+                value       TEXT NOT NULL,
+                weight      REAL NOT NULL DEFAULT 0,
+                ratings     INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (dimension, value)
+            )
+        """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS model_calls (
+                id              INTEGER PRIMARY KEY AUTOINCREMENT,
+                purpose         TEXT NOT NULL,
+                attempt         INTEGER,
+                model           TEXT NOT NULL,
+                latency_ms      INTEGER,
+                input_tokens    INTEGER,
+                output_tokens   INTEGER,
+                outcome         TEXT,
+                created_at      TEXT NOT NULL
+            )
+        """)
+        _init_fts(conn)
+        # Migrate: seed the model from ratings given before it existed
+        if conn.execute("SELECT 1 FROM preferences LIMIT 1").fetchone() is None:
+            rows = conn.execute(
+                "SELECT artist, genre, styles, label, rating FROM suggestions WHERE rating IS NOT NULL"
+            ).fetchall()
+            for artist, genre, styles, label, rating in rows:
+                _apply_rating(conn, artist, genre, styles, label, RATING_WEIGHTS[rating], 1)
         conn.commit()
 
 
+def _init_fts(conn):
+    """
+    Full-text index over artist/title/genre, kept in sync by triggers. Built
+    from existing rows the first time it is created. Skipped if this SQLite
+    build has no FTS5 (search then falls back to LIKE).
+    """
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'suggestions_fts'"
+    ).fetchone()
+    if exists:
+        return
+    try:
+        conn.execute("""
+            CREATE VIRTUAL TABLE suggestions_fts USING fts5(
+                artist, title, genre,
+                content='suggestions', content_rowid='id'
+            )
+        """)
+    except sqlite3.OperationalError:
+        return
+    conn.executescript("""
+        CREATE TRIGGER IF NOT EXISTS suggestions_fts_ai AFTER INSERT ON suggestions BEGIN
+            INSERT INTO suggestions_fts (rowid, artist, title, genre)
+            VALUES (new.id, new.artist, new.title, new.genre);
+        END;
+        CREATE TRIGGER IF NOT EXISTS suggestions_fts_ad AFTER DELETE ON suggestions BEGIN
+            INSERT INTO suggestions_fts (suggestions_fts, rowid, artist, title, genre)
+            VALUES ('delete', old.id, old.artist, old.title, old.genre);
+        END;
+        CREATE TRIGGER IF NOT EXISTS suggestions_fts_au AFTER UPDATE OF artist, title, genre ON suggestions BEGIN
+            INSERT INTO suggestions_fts (suggestions_fts, rowid, artist, title, genre)
+            VALUES ('delete', old.id, old.artist, old.title, old.genre);
+            INSERT INTO suggestions_fts (rowid, artist, title, genre)
+            VALUES (new.id, new.artist, new.title, new.genre);
+        END;
+        INSERT INTO suggestions_fts (suggestions_fts) VALUES ('rebuild');
+    """)
+
+
 def already_sent(discogs_id: str) -> bool:
     with _connect() as conn:
         row = conn.execute(
@@ -41,51 +120,175 @@ def already_sent(discogs_id: str) -> bool:
     return row is not None
 
 
-def record_suggestion(discogs_id: str, artist: str, title: str, fmt: str = "", genre: str = ""):
+def record_suggestion(discogs_id: str, artist: str, title: str, fmt: str = "", genre: str = "",
+                      styles: list[str] | None = None, label: str = "", slot_date: str | None = None):
+    """
+    Store a sent suggestion. slot_date is the daily slot (UTC date, YYYY-MM-DD)
+    it fills — today unless it backfills a missed day.
+    """
+    now = datetime.utcnow()
     with _connect() as conn:
         conn.execute(
             """INSERT OR IGNORE INTO suggestions
-               (discogs_id, artist, title, format, genre, sent_at)
-               VALUES (?, ?, ?, ?, ?, ?)""",
-            (discogs_id, artist, title, fmt, genre, datetime.utcnow().isoformat()),
+               (discogs_id, artist, title, format, genre, styles, label, sent_at, slot_date)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+            (discogs_id, artist, title, fmt, genre, ", ".join(styles or []), label,
+             now.isoformat(), slot_date or now.strftime("%Y-%m-%d")),
         )
         conn.commit()
 
 
+# How much one rating moves the weight of each of the release's dimensions
+RATING_WEIGHTS = {1: -2, 2: -1, 3: 0, 4: 1, 5: 2}
+
+
+def _apply_rating(conn, artist: str, genre: str, styles: str, label: str, delta: float, count: int):
+    """Add `delta` to the weight of every dimension value of one release."""
+    dimensions = [("Artist", artist), ("Genre", genre), ("Label", label)]
+    dimensions += [("Style", s.strip()) for s in (styles or "").split(",")]
+    conn.executemany(
+        """INSERT INTO preferences (dimension, value, weight, ratings) VALUES (?, ?, ?, ?)
+           ON CONFLICT (dimension, value) DO UPDATE SET
+               weight = weight + excluded.weight,
+               ratings = ratings + excluded.ratings""",
+        [(dimension, value, delta, count) for dimension, value in dimensions if value],
+    )
+
+
 def update_rating(discogs_id: str, rating: int):
+    """Store the rating and fold it into the preference model (replacing any earlier rating)."""
     with _connect() as conn:
+        row = conn.execute(
+            "SELECT artist, genre, styles, label, rating FROM suggestions WHERE discogs_id = ?",
+            (discogs_id,),
+        ).fetchone()
         conn.execute(
             "UPDATE suggestions SET rating = ? WHERE discogs_id = ?",
             (rating, discogs_id),
         )
+        if row is not None:
+            artist, genre, styles, label, previous = row
+            delta = RATING_WEIGHTS[rating] - (RATING_WEIGHTS[previous] if previous else 0)
+            _apply_rating(conn, artist, genre, styles, label, delta, 0 if previous else 1)
         conn.commit()
 
 
+HISTORY_COLUMNS = ("id", "artist", "title", "discogs_id", "format", "genre", "rating", "sent_at")
+_HISTORY_SELECT = f"SELECT {', '.join('s.' + c for c in HISTORY_COLUMNS)} FROM suggestions s"
+
+
+def _history_row(row) -> dict:
+    return dict(zip(HISTORY_COLUMNS, row))
+
+
 def get_history(limit: int = 20) -> list[dict]:
     with _connect() as conn:
         rows = conn.execute(
-            """SELECT artist, title, discogs_id, format, rating, sent_at
-               FROM suggestions ORDER BY sent_at DESC LIMIT ?""",
+            f"{_HISTORY_SELECT} ORDER BY s.sent_at DESC, s.id DESC LIMIT ?",
             (limit,),
         ).fetchall()
-    return [
-        {"artist": r[0], "title": r[1], "discogs_id": r[2],
-         "format": r[3], "rating": r[4], "sent_at": r[5]}
-        for r in rows
-    ]
+    return [_history_row(r) for r in rows]
+
+
+def get_history_page(cursor_id: int | None = None, direction: str = "older", limit: int = 10) -> dict:
+    """
+    One page of history, newest first, using keyset pagination on (sent_at, id):
+    the page starts just past the row `cursor_id` in the given direction
+    ("older" or "newer"), so the cost does not depend on how deep the page is.
+    Returns {"items": [...], "has_older": bool, "has_newer": bool}.
+    """
+    with _connect() as conn:
+        if cursor_id is None:
+            rows = conn.execute(
+                f"{_HISTORY_SELECT} ORDER BY s.sent_at DESC, s.id DESC LIMIT ?",
+                (limit + 1,),
+            ).fetchall()
+        else:
+            op, order = ("<", "DESC") if direction == "older" else (">", "ASC")
+            rows = conn.execute(
+                f"""{_HISTORY_SELECT}
+                    WHERE (s.sent_at, s.id) {op} (SELECT sent_at, id FROM suggestions WHERE id = ?)
+                    ORDER BY s.sent_at {order}, s.id {order} LIMIT ?""",
+                (cursor_id, limit + 1),
+            ).fetchall()
+    more = len(rows) > limit
+    items = [_history_row(r) for r in rows[:limit]]
+    if cursor_id is not None and direction == "newer":
+        items.reverse()
+        return {"items": items, "has_older": True, "has_newer": more}
+    return {"items": items, "has_older": more, "has_newer": cursor_id is not None}
+
+
+def _fts_query(text: str) -> str:
+    """Turn free text into a safe FTS5 query: every word must match, as a prefix."""
+    terms = [t.replace('"', '""') for t in text.split()]
+    return " ".join(f'"{t}"*' for t in terms)
+
+
+def search_history(text: str, limit: int = 10) -> list[dict]:
+    """Best matches for `text` across artist, title and genre."""
+    if not text.split():
+        return []
+    with _connect() as conn:
+        try:
+            rows = conn.execute(
+                f"""{_HISTORY_SELECT}
+                    JOIN suggestions_fts f ON f.rowid = s.id
+                    WHERE suggestions_fts MATCH ?
+                    ORDER BY f.rank LIMIT ?""",
+                (_fts_query(text), limit),
+            ).fetchall()
+        except sqlite3.OperationalError:
+            # No FTS5 in this SQLite build
+            pattern = f"%{text.strip()}%"
+            rows = conn.execute(
+                f"""{_HISTORY_SELECT}
+                    WHERE s.artist LIKE ? OR s.title LIKE ? OR s.genre LIKE ?
+                    ORDER BY s.sent_at DESC LIMIT ?""",
+                (pattern, pattern, pattern, limit),
+            ).fetchall()
+    return [_history_row(r) for r in rows]
+
+
+def iter_history() -> Iterator[dict]:
+    """Yield every suggestion, newest first, one row at a time (for exports)."""
+    with _connect() as conn:
+        for row in conn.execute(f"{_HISTORY_SELECT} ORDER BY s.sent_at DESC, s.id DESC"):
+            yield _history_row(row)
 
 
 def suggestion_sent_today() -> bool:
-    """Return True if a suggestion was already recorded today (UTC date)."""
+    """Return True if today's slot (UTC date) already has a suggestion."""
     today = datetime.utcnow().strftime("%Y-%m-%d")
     with _connect() as conn:
         row = conn.execute(
-            "SELECT 1 FROM suggestions WHERE sent_at LIKE ? LIMIT 1",
-            (f"{today}%",),
+            "SELECT 1 FROM suggestions WHERE slot_date = ? LIMIT 1",
+            (today,),
         ).fetchone()
     return row is not None
 
 
+def record_model_call(purpose: str, attempt: int, model: str, latency_ms: int,
+                      input_tokens: int, output_tokens: int, outcome: str):
+    """Log one Claude call (which model, latency, tokens, what happened to its answer)."""
+    with _connect() as conn:
+        conn.execute(
+            """INSERT INTO model_calls
+               (purpose, attempt, model, latency_ms, input_tokens, output_tokens, outcome, created_at)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+            (purpose, attempt, model, latency_ms, input_tokens, output_tokens, outcome,
+             datetime.utcnow().isoformat()),
+        )
+        conn.commit()
+
+
+def last_slot_date() -> str | None:
+    """Return the latest daily slot (YYYY-MM-DD) that has a suggestion, or None if none yet."""
+    with _connect() as conn:
+        row = conn.execute("SELECT MAX(slot_date) FROM suggestions").fetchone()
+    return row[0] if row and row[0] else None
+
+
 def get_recent_genres(limit: int = 5) -> list[str]:
     """Return genres from the last N suggestions (for rotation)."""
     with _connect() as conn:
@@ -106,17 +309,32 @@ def get_recent_artists(limit: int = 10) -> list[str]:
     return [r[0] for r in rows if r[0]]
 
 
-def get_rated_history() -> dict[str, list[str]]:
-    """Return liked (4-5★) and disliked (1-2★) suggestions for Claude context."""
+def get_preference_summary(top_k: int = 8, exemplars: int = 3) -> dict:
+    """
+    Bounded view of the preference model for the Claude prompt: the top_k most
+    liked and most disliked (dimension, value, weight) entries, plus a few of
+    the most recent liked (4-5★) and disliked (1-2★) suggestions.
+    """
     with _connect() as conn:
-        rows = conn.execute(
-            "SELECT artist, title, rating FROM suggestions WHERE rating IS NOT NULL"
+        liked = conn.execute(
+            "SELECT dimension, value, weight FROM preferences WHERE weight > 0 ORDER BY weight DESC LIMIT ?",
+            (top_k,),
+        ).fetchall()
+        disliked = conn.execute(
+            "SELECT dimension, value, weight FROM preferences WHERE weight < 0 ORDER BY weight ASC LIMIT ?",
+            (top_k,),
+        ).fetchall()
+        liked_examples = conn.execute(
+            "SELECT artist, title FROM suggestions WHERE rating >= 4 ORDER BY sent_at DESC LIMIT ?",
+            (exemplars,),
+        ).fetchall()
+        disliked_examples = conn.execute(
+            "SELECT artist, title FROM suggestions WHERE rating <= 2 ORDER BY sent_at DESC LIMIT ?",
+            (exemplars,),
         ).fetchall()
-    liked, disliked = [], []
-    for artist, title, rating in rows:
-        entry = f"{artist} – {title}"
-        if rating >= 4:
-            liked.append(entry)
-        elif rating <= 2:
-            disliked.append(entry)
-    return {"liked": liked, "disliked": disliked}
+    return {
+        "liked": liked,
+        "disliked": disliked,
+        "liked_examples": [f"{artist} – {title}" for artist, title in liked_examples],
+        "disliked_examples": [f"{artist} – {title}" for artist, title in disliked_examples],
+    }
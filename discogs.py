@@ -1,12 +1,16 @@
 """
 Discogs API helpers using the REST API directly.
 """
-import json
-import os
+import itertools
 import re
+import struct
+import sys
+import threading
 import time
-from datetime import datetime, timezone
-import requests
+from collections import Counter
+from typing import Iterable, Iterator, NamedTuple
+
+import cache
 from config import DISCOGS_TOKEN, DISCOGS_USERNAME, CACHE_PATH, CACHE_TTL_HOURS
 
 BASE_URL = "https://api.discogs.com"
@@ -28,142 +32,226 @@ def normalize(s: str) -> str:
     return s
 
 
+# Discogs allows 60 authenticated requests per minute. Requests may come from
+# several threads (prefetching, batch validation), so spacing is shared.
+_MIN_REQUEST_INTERVAL = 1.0
+_rate_lock = threading.Lock()
+_next_request_at = 0.0
+
+
+def _throttle():
+    """Block until this thread may send the next Discogs request."""
+    global _next_request_at
+    with _rate_lock:
+        now = time.monotonic()
+        wait = _next_request_at - now
+        _next_request_at = max(now, _next_request_at) + _MIN_REQUEST_INTERVAL
+    if wait > 0:
+        time.sleep(wait)
+
+
 def _get(url, params=None) -> dict:
+    import requests  # imported lazily to keep bot startup fast
+
+    _throttle()
     resp = requests.get(url, headers=HEADERS, params=params, timeout=15)
     resp.raise_for_status()
-    time.sleep(0.5)  # stay under 60 req/min
     return resp.json()
 
 
-def _fetch_all_pages(url: str, data_key: str, extra_params: dict = None) -> list:
-    items = []
+def _iter_pages(url: str, data_key: str, extra_params: dict = None) -> Iterator[dict]:
+    """Yield raw items one page at a time, so only a single page is ever held in memory."""
     page = 1
     while True:
         params = {"page": page, "per_page": 100}
         if extra_params:
             params.update(extra_params)
         data = _get(url, params=params)
-        items.extend(data.get(data_key, []))
+        yield from data.get(data_key, [])
         pagination = data.get("pagination", {})
         if page >= pagination.get("pages", 1):
             break
         page += 1
-    return items
+
+
+# ---------------------------------------------------------------------------
+# Compact release records
+# ---------------------------------------------------------------------------
+
+class Release(NamedTuple):
+    """One collection/wantlist entry. Tuple-backed, so no per-instance __dict__."""
+    id: str
+    title: str
+    artists: tuple[str, ...]
+    genres: tuple[str, ...]
+    styles: tuple[str, ...]
+    labels: tuple[str, ...]
+    year: int | None
+
+
+def _interned(values) -> tuple[str, ...]:
+    # Genres, styles and labels repeat across thousands of records — share one copy of each
+    return tuple(sys.intern(v) for v in values if v)
+
+
+def _parse_basic(item: dict) -> Release:
+    info = item.get("basic_information", {})
+    return Release(
+        id=str(item.get("id", info.get("id", ""))),
+        title=info.get("title", ""),
+        artists=tuple(a.get("name", "") for a in info.get("artists", [])),
+        genres=_interned(info.get("genres") or []),
+        styles=_interned(info.get("styles") or []),
+        labels=_interned(l.get("name", "") for l in info.get("labels", [])),
+        year=info.get("year") or None,
+    )
 
 
 # ---------------------------------------------------------------------------
 # Cache helpers
 # ---------------------------------------------------------------------------
+# Only the derived library summary is cached (see cache.py), never raw records.
 
 def _cache_is_fresh() -> bool:
-    if not os.path.exists(CACHE_PATH):
-        return False
-    try:
-        with open(CACHE_PATH) as f:
-            data = json.load(f)
-        cached_at = datetime.fromisoformat(data["cached_at"])
-        age_hours = (datetime.now(timezone.utc) - cached_at).total_seconds() / 3600
-        return age_hours < CACHE_TTL_HOURS
-    except Exception:
+    ts = cache.cached_at(CACHE_PATH)
+    if ts is None:
         return False
+    age_hours = (time.time() - ts) / 3600
+    return age_hours < CACHE_TTL_HOURS
 
 
-def _load_cache() -> tuple[list, list]:
-    with open(CACHE_PATH) as f:
-        data = json.load(f)
-    return data["collection"], data["wantlist"]
+def _load_cache() -> dict:
+    library = cache.load(CACHE_PATH)
+    library["profile"] = profile_from_counts(library["counts"])
+    return library
 
 
-def _save_cache(collection: list, wantlist: list):
-    with open(CACHE_PATH, "w") as f:
-        json.dump({
-            "cached_at": datetime.now(timezone.utc).isoformat(),
-            "collection": collection,
-            "wantlist": wantlist,
-        }, f)
+def _save_cache(library: dict):
+    cache.write(CACHE_PATH, library["counts"], library["owned_ids"], library["owned_titles"])
 
 
 # ---------------------------------------------------------------------------
 # Collection / wantlist fetching
 # ---------------------------------------------------------------------------
 
-def fetch_collection() -> list[dict]:
+def iter_collection() -> Iterator[Release]:
     url = f"{BASE_URL}/users/{DISCOGS_USERNAME}/collection/folders/0/releases"
-    items = _fetch_all_pages(url, "releases")
-    return [_parse_basic(item) for item in items]
+    return (_parse_basic(item) for item in _iter_pages(url, "releases"))
 
 
-def fetch_wantlist() -> list[dict]:
+def iter_wantlist() -> Iterator[Release]:
     url = f"{BASE_URL}/users/{DISCOGS_USERNAME}/wants"
-    items = _fetch_all_pages(url, "wants")
-    return [_parse_basic(item) for item in items]
+    return (_parse_basic(item) for item in _iter_pages(url, "wants"))
 
 
-def fetch_collection_and_wantlist() -> tuple[list[dict], list[dict]]:
+def load_library() -> dict:
     """
-    Return (collection, wantlist), using a local cache refreshed every 24 hours.
-    This avoids hitting the Discogs API on every suggestion request.
+    Return the user's library summary (see build_library), using a local cache
+    refreshed every CACHE_TTL_HOURS. On a refresh, records are streamed from the
+    Discogs API straight into the summary, so the full collection is never held
+    in memory.
     """
     if _cache_is_fresh():
-        print("  Using cached Discogs data.")
-        return _load_cache()
-
-    print("  Cache stale or missing — fetching from Discogs…")
-    collection = fetch_collection()
-    wantlist = fetch_wantlist()
-    _save_cache(collection, wantlist)
-    print(f"  Cached {len(collection)} collection + {len(wantlist)} wantlist items.")
-    return collection, wantlist
-
-
-def _parse_basic(item: dict) -> dict:
-    info = item.get("basic_information", {})
-    return {
-        "id": str(item.get("id", info.get("id", ""))),
-        "title": info.get("title", ""),
-        "artists": [a.get("name", "") for a in info.get("artists", [])],
-        "genres": info.get("genres", []),
-        "styles": info.get("styles", []),
-        "labels": [l.get("name", "") for l in info.get("labels", [])],
-        "year": info.get("year"),
-    }
+        try:
+            library = _load_cache()
+        except (ValueError, IndexError, KeyError, struct.error, OSError) as e:
+            print(f"  Cache unreadable ({e}) — fetching from Discogs…")
+        else:
+            print("  Using cached Discogs data.")
+            return library
+    else:
+        print("  Cache stale or missing — fetching from Discogs…")
+    items = itertools.chain(
+        (("collection", r) for r in iter_collection()),
+        (("wantlist", r) for r in iter_wantlist()),
+    )
+    library = build_library(items)
+    _save_cache(library)
+    profile = library["profile"]
+    print(f"  Cached {profile['total_collection']} collection + {profile['total_wantlist']} wantlist items.")
+    return library
 
 
 # ---------------------------------------------------------------------------
 # Taste profile builder
 # ---------------------------------------------------------------------------
 
-def build_taste_profile(collection: list[dict], wantlist: list[dict]) -> dict:
-    from collections import Counter
+def _owned_title_keys(release: Release) -> list[tuple[str, str]]:
+    """
+    Normalized (artist, title) pairs for a release, so any repress or reissue of
+    the same album can be detected and excluded.
 
-    all_items = collection + wantlist
+    For multi-artist releases (e.g. Discogs stores ["Cluster", "Eno"] separately),
+    we return both the first artist alone AND all artists joined, so that a Claude
+    suggestion like "Cluster & Eno" still matches correctly.
+    """
+    if not release.artists or not release.title:
+        return []
+    norm_title = normalize(release.title)
+    # First artist alone
+    keys = [(normalize(release.artists[0]), norm_title)]
+    # All artists joined — catches "Cluster & Eno" style suggestions
+    if len(release.artists) > 1:
+        keys.append((normalize(" ".join(release.artists)), norm_title))
+    return keys
+
+
+def build_library(items: Iterable[tuple[str, Release]]) -> dict:
+    """
+    Consume a stream of (source, release) pairs — source is "collection" or
+    "wantlist" — in a single pass, building the raw profile counters, the taste
+    profile, the set of owned release IDs and the set of owned normalized
+    (artist, title) pairs.
+    """
     genres: Counter = Counter()
     styles: Counter = Counter()
     artists: Counter = Counter()
     labels: Counter = Counter()
     decades: Counter = Counter()
-
-    for item in all_items:
-        genres.update(item.get("genres") or [])
-        styles.update(item.get("styles") or [])
-        artists.update(item.get("artists") or [])
-        labels.update(item.get("labels") or [])
-        year = item.get("year")
-        if year:
+    totals: Counter = Counter()
+    owned_ids: set[str] = set()
+    owned_titles: set[tuple[str, str]] = set()
+
+    for source, item in items:
+        totals[source] += 1
+        genres.update(item.genres)
+        styles.update(item.styles)
+        artists.update(item.artists)
+        labels.update(item.labels)
+        if item.year:
             try:
-                decade = (int(year) // 10) * 10
+                decade = (int(item.year) // 10) * 10
                 decades[f"{decade}s"] += 1
             except (ValueError, TypeError):
                 pass
+        owned_ids.add(item.id)
+        owned_titles.update(_owned_title_keys(item))
+
+    counts = {
+        "genres": genres,
+        "styles": styles,
+        "artists": artists,
+        "labels": labels,
+        "decades": decades,
+        "totals": totals,
+    }
+    return {
+        "counts": counts,
+        "profile": profile_from_counts(counts),
+        "owned_ids": owned_ids,
+        "owned_titles": owned_titles,
+    }
 
+
+def profile_from_counts(counts: dict[str, Counter]) -> dict:
     return {
-        "top_genres": genres.most_common(10),
-        "top_styles": styles.most_common(15),
-        "top_artists": artists.most_common(20),
-        "top_labels": labels.most_common(10),
-        "top_decades": sorted(decades.items()),
-        "total_collection": len(collection),
-        "total_wantlist": len(wantlist),
+        "top_genres": counts["genres"].most_common(10),
+        "top_styles": counts["styles"].most_common(15),
+        "top_artists": counts["artists"].most_common(20),
+        "top_labels": counts["labels"].most_common(10),
+        "top_decades": sorted(counts["decades"].items()),
+        "total_collection": counts["totals"]["collection"],
+        "total_wantlist": counts["totals"]["wantlist"],
     }
 
 
@@ -249,6 +337,8 @@ def search_release(artist: str, title: str) -> dict | None:
                 "url": f"https://www.discogs.com/release/{release_id}",
                 "year": r.get("year"),
                 "format": matched_fmt,
+                "styles": r.get("style") or [],
+                "label": (r.get("label") or [""])[0],
             })
 
     if not candidates:
@@ -291,31 +381,3 @@ def calculate_rarity(have: int, want: int) -> tuple[str, str]:
         return "💎💎", "Uncommon"
     else:
         return "💎", "Common"
-
-
-def get_owned_ids(collection: list[dict], wantlist: list[dict]) -> set[str]:
-    return {item["id"] for item in collection + wantlist}
-
-
-def get_owned_titles(collection: list[dict], wantlist: list[dict]) -> set[tuple[str, str]]:
-    """
-    Return a set of normalized (artist, title) pairs for every owned release,
-    so any repress or reissue of the same album can be detected and excluded.
-
-    For multi-artist releases (e.g. Discogs stores ["Cluster", "Eno"] separately),
-    we store both the first artist alone AND all artists joined, so that a Claude
-    suggestion like "Cluster & Eno" still matches correctly.
-    """
-    owned = set()
-    for item in collection + wantlist:
-        artists = item.get("artists", [])
-        title = item.get("title", "")
-        if not artists or not title:
-            continue
-        norm_title = normalize(title)
-        # First artist alone
-        owned.add((normalize(artists[0]), norm_title))
-        # All artists joined — catches "Cluster & Eno" style suggestions
-        if len(artists) > 1:
-            owned.add((normalize(" ".join(artists)), norm_title))
-    return owned
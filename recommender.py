@@ -4,9 +4,11 @@ then resolves it to a real Discogs release with community rarity stats.
 """
 import json
 import re
-import anthropic
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable
 
-from config import ANTHROPIC_API_KEY
+from config import ANTHROPIC_API_KEY, CLAUDE_FAST_MODEL, CLAUDE_STRONG_MODEL, CLAUDE_ESCALATE_AFTER
 import discogs
 import database
 
@@ -18,8 +20,8 @@ based on their Discogs taste profile.
 IMPORTANT FORMAT RULE: You may ONLY suggest releases available on VINYL or CASSETTE.
 No CDs, no digital releases, no WAV/FLAC releases, no DVDs. Vinyl or cassette only.
 
-You must respond with a single valid JSON object — no markdown, no extra text —
-with exactly these fields:
+You must give your answer by calling the provided tool — no extra text.
+Each suggestion has exactly these fields, e.g.:
 {
   "artist": "Artist Name",
   "title": "Album Title",
@@ -47,9 +49,134 @@ Rules:
 """
 
 
-def _ask_claude(taste_summary: str, already_suggested: list[str], rated: dict, recent_artists: list[str], recent_genres: list[str], owned_titles: set[tuple[str, str]] | None = None) -> dict:
-    client = anthropic.Anthropic(api_key=ANTHROPIC_API_KEY)
+SUGGESTION_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "artist": {"type": "string"},
+        "title": {"type": "string"},
+        "year": {"type": "integer"},
+        "format": {"type": "string", "enum": ["Vinyl", "Cassette"]},
+        "genre": {"type": "string"},
+        "info": {"type": "string"},
+    },
+    "required": ["artist", "title", "year", "format", "genre", "info"],
+    "additionalProperties": False,
+}
 
+SUGGEST_TOOL = {
+    "name": "suggest_record",
+    "description": "Suggest one vinyl or cassette record for the collector.",
+    "input_schema": SUGGESTION_SCHEMA,
+}
+
+SUGGEST_BATCH_TOOL = {
+    "name": "suggest_records",
+    "description": "Suggest several different vinyl or cassette records for the collector.",
+    "input_schema": {
+        "type": "object",
+        "properties": {"suggestions": {"type": "array", "items": SUGGESTION_SCHEMA}},
+        "required": ["suggestions"],
+        "additionalProperties": False,
+    },
+}
+
+_FORMAT_ALIASES = {"vinyl": "Vinyl", "lp": "Vinyl", "ep": "Vinyl", "12\"": "Vinyl", "7\"": "Vinyl",
+                   "cassette": "Cassette", "tape": "Cassette", "mc": "Cassette"}
+
+
+def _repair(candidate) -> dict:
+    """
+    Validate a suggestion against SUGGESTION_SCHEMA, fixing what can be fixed
+    locally (stray whitespace, year as a string, format spelling, missing
+    optional text). Raises ValueError if artist or title is unusable or the
+    format is neither vinyl nor cassette, so a model round trip is spent on a
+    retry only when it is really needed.
+    """
+    if not isinstance(candidate, dict):
+        raise ValueError(f"Expected an object, got {type(candidate).__name__}")
+    fixed = {}
+    for key in ("artist", "title", "genre", "info"):
+        value = candidate.get(key)
+        fixed[key] = value.strip() if isinstance(value, str) else ""
+    if not fixed["artist"] or not fixed["title"]:
+        raise ValueError("Suggestion is missing artist or title")
+
+    year = candidate.get("year")
+    if isinstance(year, str):
+        match = re.search(r"\d{4}", year)
+        year = int(match.group()) if match else None
+    fixed["year"] = year if isinstance(year, int) and not isinstance(year, bool) else None
+
+    fmt = candidate.get("format")
+    if fmt is None:
+        print("  Suggestion has no format, assuming Vinyl")
+        fixed["format"] = "Vinyl"
+    elif isinstance(fmt, str) and fmt.strip().lower() in _FORMAT_ALIASES:
+        fixed["format"] = _FORMAT_ALIASES[fmt.strip().lower()]
+    else:
+        # e.g. "CD" or "Digital" — the model broke the vinyl/cassette rule
+        raise ValueError(f"Unsupported format {fmt!r}")
+    return fixed
+
+
+def _text_json(message):
+    """Fallback for a reply that ignored the tool: pull the JSON out of its text."""
+    text = "".join(block.text for block in message.content if block.type == "text").strip()
+    text = re.sub(r"^```[a-z]*\n?", "", text)
+    text = re.sub(r"\n?```$", "", text)
+    start = min((i for i in (text.find("{"), text.find("[")) if i >= 0), default=0)
+    end = max(text.rfind("}"), text.rfind("]")) + 1
+    return json.loads(text[start:end or None])
+
+
+def _tool_input(message, tool_name: str):
+    for block in message.content:
+        if block.type == "tool_use" and block.name == tool_name:
+            return block.input
+    return _text_json(message)
+
+
+# Matches a complete "artist"/"title" string field in a partially streamed JSON object
+_STREAM_FIELDS = {
+    key: re.compile(rf'"{key}"\s*:\s*("(?:[^"\\]|\\.)*")')
+    for key in ("artist", "title")
+}
+
+
+def _early_fields(partial: str) -> tuple[str, str] | None:
+    """Return (artist, title) once both are complete in a partial response, else None."""
+    matches = [_STREAM_FIELDS[key].search(partial) for key in ("artist", "title")]
+    if not all(matches):
+        return None
+    try:
+        artist, title = (json.loads(m.group(1)) for m in matches)
+    except json.JSONDecodeError:
+        return None
+    # Same whitespace handling as _repair, so prefetch keys match the final suggestion
+    return artist.strip(), title.strip()
+
+
+def _format_preferences(preferences: dict) -> str:
+    """Bounded summary of the rating-driven preference model (see database.get_preference_summary)."""
+    def dims(entries):
+        return ", ".join(f"{dimension}: {value} ({weight:+g})" for dimension, value, weight in entries)
+
+    text = ""
+    if preferences["liked"]:
+        text += "\n\nFrom the user's ratings, they LEAN TOWARDS (weight in brackets): " + dims(preferences["liked"])
+    if preferences["disliked"]:
+        text += "\n\nFrom the user's ratings, they STEER AWAY FROM: " + dims(preferences["disliked"])
+    if preferences["liked_examples"]:
+        text += "\n\nRecent suggestions they LOVED (rated 4-5★):\n"
+        text += "\n".join(f"- {s}" for s in preferences["liked_examples"])
+    if preferences["disliked_examples"]:
+        text += "\n\nRecent suggestions they DISLIKED (rated 1-2★):\n"
+        text += "\n".join(f"- {s}" for s in preferences["disliked_examples"])
+    return text
+
+
+def _build_context(taste_summary: str, already_suggested: list[str], preferences: dict, recent_artists: list[str], recent_genres: list[str], owned_titles: set[tuple[str, str]] | None = None) -> str:
+    """The shared part of the user prompt: profile, ratings and everything to avoid."""
     exclusion = ""
     if already_suggested:
         exclusion = "\n\nDo NOT suggest any of these already-sent records:\n" + "\n".join(
@@ -75,117 +202,352 @@ def _ask_claude(taste_summary: str, already_suggested: list[str], rated: dict, r
         owned_lines = sorted(f"- {artist} – {title}" for artist, title in owned_titles)
         owned_exclusion = "\n\nThe user already owns or has wishlisted ALL of these records — do NOT suggest any of them:\n" + "\n".join(owned_lines)
 
-    rating_context = ""
-    if rated["liked"]:
-        rating_context += "\n\nThe user LOVED these suggestions (rated 4-5★) — lean into this taste:\n"
-        rating_context += "\n".join(f"- {s}" for s in rated["liked"])
-    if rated["disliked"]:
-        rating_context += "\n\nThe user DISLIKED these suggestions (rated 1-2★) — avoid this direction:\n"
-        rating_context += "\n".join(f"- {s}" for s in rated["disliked"])
+    rating_context = _format_preferences(preferences)
 
-    user_message = (
+    return (
         f"Here is the collector's taste profile:\n\n{taste_summary}"
-        f"{rating_context}{owned_exclusion}{exclusion}{artist_exclusion}{genre_context}\n\n"
-        "Please suggest one vinyl or cassette record they would love. Respond only with the JSON."
+        f"{rating_context}{owned_exclusion}{exclusion}{artist_exclusion}{genre_context}"
     )
 
-    message = client.messages.create(
-        model="claude-opus-4-6",
-        max_tokens=512,
-        system=SYSTEM_PROMPT,
-        messages=[{"role": "user", "content": user_message}],
-    )
 
-    raw = message.content[0].text.strip()
-    raw = re.sub(r"^```[a-z]*\n?", "", raw)
-    raw = re.sub(r"\n?```$", "", raw)
-    return json.loads(raw)
+def _call_info(model: str, started: float, message) -> dict:
+    """Per-call accounting: which model, how long it took and how many tokens it used."""
+    return {
+        "model": model,
+        "latency_ms": int((time.monotonic() - started) * 1000),
+        "input_tokens": message.usage.input_tokens,
+        "output_tokens": message.usage.output_tokens,
+        "error": None,
+    }
+
 
+def _pick_model(rejections: int, strong: bool) -> str:
+    """The fast model drafts candidates; the strong one is kept for the daily pick
+    and for when the fast model's candidates keep getting rejected."""
+    if strong or rejections >= CLAUDE_ESCALATE_AFTER:
+        return CLAUDE_STRONG_MODEL
+    return CLAUDE_FAST_MODEL
 
-def get_suggestion(max_attempts: int = 5) -> dict | None:
+
+def _ask_claude(context: str, model: str, on_candidate: Callable[[str, str], None] | None = None) -> tuple[dict | None, dict]:
     """
-    Build a taste profile, ask Claude for a vinyl/cassette suggestion,
-    find it on Discogs, fetch rarity stats.
-    Returns a dict or None if all attempts fail.
+    Ask Claude for one suggestion via the suggest_record tool. The tool input is
+    streamed; as soon as the artist and title are complete, on_candidate(artist,
+    title) is called so the caller can start validating before the rest of the
+    response arrives.
+    Returns (suggestion, call info); suggestion is None if the reply was unusable.
     """
-    print("Loading Discogs collection and wantlist…")
-    collection, wantlist = discogs.fetch_collection_and_wantlist()
-    print(f"  {len(collection)} collection + {len(wantlist)} wantlist items")
+    import anthropic  # imported lazily: the SDK is slow to load and only needed here
 
-    profile = discogs.build_taste_profile(collection, wantlist)
-    taste_summary = discogs.format_profile_for_prompt(profile)
-    owned_ids = discogs.get_owned_ids(collection, wantlist)
-    owned_titles = discogs.get_owned_titles(collection, wantlist)
+    client = anthropic.Anthropic(api_key=ANTHROPIC_API_KEY)
+    user_message = (
+        f"{context}\n\n"
+        "Please suggest one vinyl or cassette record they would love."
+    )
 
-    history = database.get_history(limit=50)
-    already_suggested = [f"{h['artist']} – {h['title']}" for h in history]
-    rated = database.get_rated_history()
-    recent_artists = database.get_recent_artists(limit=10)
-    recent_genres = database.get_recent_genres(limit=5)
+    partial = ""
+    announced = False
+    started = time.monotonic()
+    with client.messages.stream(
+        model=model,
+        max_tokens=512,
+        system=SYSTEM_PROMPT,
+        tools=[SUGGEST_TOOL],
+        tool_choice={"type": "tool", "name": SUGGEST_TOOL["name"]},
+        messages=[{"role": "user", "content": user_message}],
+    ) as stream:
+        for event in stream:
+            if event.type != "content_block_delta" or event.delta.type != "input_json_delta":
+                continue
+            partial += event.delta.partial_json
+            if on_candidate and not announced:
+                fields = _early_fields(partial)
+                if fields:
+                    on_candidate(*fields)
+                    announced = True
+        message = stream.get_final_message()
+    call = _call_info(model, started, message)
+
+    try:
+        return _repair(_tool_input(message, SUGGEST_TOOL["name"])), call
+    except (ValueError, KeyError, IndexError) as e:
+        call["error"] = str(e)
+        return None, call
+
+
+def _ask_claude_batch(context: str, count: int, model: str) -> tuple[list[dict], dict]:
+    """
+    Ask Claude for `count` distinct suggestions in a single suggest_records call.
+    Malformed entries are repaired where possible and dropped otherwise, so one
+    bad entry does not cost the whole batch.
+    Returns (candidates, call info).
+    """
+    import anthropic
 
-    for attempt in range(1, max_attempts + 1):
-        print(f"Asking Claude for suggestion (attempt {attempt}/{max_attempts})…")
+    client = anthropic.Anthropic(api_key=ANTHROPIC_API_KEY)
+    user_message = (
+        f"{context}\n\n"
+        f"Please suggest {count} different vinyl or cassette records they would love, "
+        "each by a different artist and spread across their genres."
+    )
+
+    started = time.monotonic()
+    message = client.messages.create(
+        model=model,
+        max_tokens=256 * count + 256,
+        system=SYSTEM_PROMPT,
+        tools=[SUGGEST_BATCH_TOOL],
+        tool_choice={"type": "tool", "name": SUGGEST_BATCH_TOOL["name"]},
+        messages=[{"role": "user", "content": user_message}],
+    )
+    call = _call_info(model, started, message)
+
+    try:
+        data = _tool_input(message, SUGGEST_BATCH_TOOL["name"])
+    except ValueError as e:
+        call["error"] = str(e)
+        return [], call
+    raw_candidates = data.get("suggestions") if isinstance(data, dict) else data
+    if not isinstance(raw_candidates, list):
+        call["error"] = "Expected a list of suggestions"
+        return [], call
+
+    candidates = []
+    for raw in raw_candidates:
         try:
-            suggestion = _ask_claude(taste_summary, already_suggested, rated, recent_artists, recent_genres, owned_titles)
-        except (json.JSONDecodeError, KeyError, IndexError) as e:
-            print(f"  Claude response parse error: {e}")
-            continue
+            candidates.append(_repair(raw))
+        except ValueError as e:
+            print(f"  Dropping malformed candidate: {e}")
+    return candidates, call
+
+
+def _local_rejection(artist: str, title: str, recent_artists: list[str], owned_titles: set[tuple[str, str]]) -> str | None:
+    """Reason to reject a candidate without any network calls, or None if it passes."""
+    if artist in recent_artists:
+        return "artist suggested recently"
+    # Reject if any version of this album is already owned
+    if (discogs.normalize(artist), discogs.normalize(title)) in owned_titles:
+        return "you already own a version"
+    return None
 
-        artist = suggestion.get("artist", "")
-        title = suggestion.get("title", "")
-        why = suggestion.get("info", "")
-        year = suggestion.get("year")
-        fmt = suggestion.get("format", "Vinyl")
-        genre = suggestion.get("genre", "")
 
-        print(f"  Claude suggests: {artist} – {title} ({year}) [{fmt}]")
+def _release_rejection(result: dict | None, owned_ids: set[str]) -> str | None:
+    """Reason to reject a Discogs search result, or None if it can be sent."""
+    if result is None:
+        return "not on Discogs as vinyl/cassette"
+    if database.already_sent(result["id"]):
+        return "already suggested"
+    if result["id"] in owned_ids:
+        return "already in your collection/wantlist"
+    return None
 
-        if artist in recent_artists:
-            print(f"  Artist '{artist}' was suggested recently, retrying…")
-            already_suggested.append(f"{artist} – {title}")
-            continue
 
-        # Reject if any version of this album is already owned
-        if (discogs.normalize(artist), discogs.normalize(title)) in owned_titles:
-            print(f"  User already owns a version of '{artist} – {title}', retrying…")
-            already_suggested.append(f"{artist} – {title}")
-            continue
+def _build_suggestion(suggestion: dict, result: dict) -> dict:
+    """Combine Claude's fields with the Discogs release and its rarity stats."""
+    stats = discogs.get_community_stats(result["id"])
+    rarity_bar, rarity_label = discogs.calculate_rarity(stats["have"], stats["want"])
+    return {
+        "artist": suggestion.get("artist", ""),
+        "title": suggestion.get("title", ""),
+        "year": suggestion.get("year"),
+        "format": result.get("format", suggestion.get("format", "Vinyl")),
+        "genre": suggestion.get("genre", ""),
+        "styles": result.get("styles", []),
+        "label": result.get("label", ""),
+        "why": suggestion.get("info", ""),
+        "discogs_url": result["url"],
+        "discogs_id": result["id"],
+        "have": stats["have"],
+        "want": stats["want"],
+        "rarity_bar": rarity_bar,
+        "rarity_label": rarity_label,
+    }
+
+
+def _load_state() -> dict:
+    """Everything a suggestion run needs from Discogs and the database, loaded once."""
+    print("Loading Discogs collection and wantlist…")
+    library = discogs.load_library()
+    profile = library["profile"]
+    print(f"  {profile['total_collection']} collection + {profile['total_wantlist']} wantlist items")
 
-        result = discogs.search_release(artist, title)
-        if result is None:
-            print("  Not found on Discogs as vinyl/cassette, retrying…")
-            already_suggested.append(f"{artist} – {title}")
-            continue
+    history = database.get_history(limit=50)
+    return {
+        "taste_summary": discogs.format_profile_for_prompt(profile),
+        "owned_ids": library["owned_ids"],
+        "owned_titles": library["owned_titles"],
+        "already_suggested": [f"{h['artist']} – {h['title']}" for h in history],
+        "preferences": database.get_preference_summary(),
+        "recent_artists": database.get_recent_artists(limit=10),
+        "recent_genres": database.get_recent_genres(limit=5),
+    }
+
+
+def _context_for(state: dict) -> str:
+    return _build_context(
+        state["taste_summary"], state["already_suggested"], state["preferences"],
+        state["recent_artists"], state["recent_genres"], state["owned_titles"],
+    )
 
-        if database.already_sent(result["id"]):
-            print("  Already sent this one, retrying…")
-            already_suggested.append(f"{artist} – {title}")
-            continue
 
-        if result["id"] in owned_ids:
-            print("  Already in collection/wantlist, retrying…")
-            already_suggested.append(f"{artist} – {title}")
-            continue
+def _log_call(purpose: str, attempt: int, call: dict, outcome: str):
+    print(
+        f"  [{call['model']}] {call['latency_ms']} ms, "
+        f"{call['input_tokens']} in / {call['output_tokens']} out tokens → {outcome}"
+    )
+    database.record_model_call(
+        purpose, attempt, call["model"], call["latency_ms"],
+        call["input_tokens"], call["output_tokens"], outcome,
+    )
 
-        # Fetch rarity
-        print(f"  Fetching community stats for release {result['id']}…")
-        stats = discogs.get_community_stats(result["id"])
-        rarity_bar, rarity_label = discogs.calculate_rarity(stats["have"], stats["want"])
-
-        return {
-            "artist": artist,
-            "title": title,
-            "year": year,
-            "format": result.get("format", fmt),
-            "genre": genre,
-            "why": why,
-            "discogs_url": result["url"],
-            "discogs_id": result["id"],
-            "have": stats["have"],
-            "want": stats["want"],
-            "rarity_bar": rarity_bar,
-            "rarity_label": rarity_label,
-        }
+
+def get_suggestion(max_attempts: int = 5, on_progress: Callable[[str], None] | None = None, strong: bool = False) -> dict | None:
+    """
+    Build a taste profile, ask Claude for a vinyl/cassette suggestion,
+    find it on Discogs, fetch rarity stats.
+    on_progress, if given, receives short human-readable status updates.
+    Attempts start on the fast model and escalate to the strong one after
+    CLAUDE_ESCALATE_AFTER rejections; strong=True (the daily pick) uses the
+    strong model throughout.
+    Returns a dict or None if all attempts fail.
+    """
+    purpose = "daily" if strong else "suggest"
+    def progress(text: str):
+        if on_progress:
+            on_progress(text)
+
+    progress("Loading your Discogs collection…")
+    state = _load_state()
+    owned_ids = state["owned_ids"]
+    owned_titles = state["owned_titles"]
+    already_suggested = state["already_suggested"]
+    recent_artists = state["recent_artists"]
+
+    # Discogs searches started while Claude is still streaming, keyed by normalized (artist, title)
+    prefetched: dict[tuple[str, str], Future] = {}
+
+    def prefetch_key(artist: str, title: str) -> tuple[str, str]:
+        return discogs.normalize(artist), discogs.normalize(title)
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        def prefetch(artist: str, title: str):
+            if _local_rejection(artist, title, recent_artists, owned_titles) is None:
+                prefetched[prefetch_key(artist, title)] = executor.submit(discogs.search_release, artist, title)
+
+        for attempt in range(1, max_attempts + 1):
+            print(f"Asking Claude for suggestion (attempt {attempt}/{max_attempts})…")
+            progress(f"Asking Claude for a pick (attempt {attempt}/{max_attempts})…")
+            model = _pick_model(attempt - 1, strong)
+            suggestion, call = _ask_claude(_context_for(state), model, on_candidate=prefetch)
+            if suggestion is None:
+                print(f"  Claude response parse error: {call['error']}")
+                _log_call(purpose, attempt, call, "parse error")
+                progress("Claude's answer was garbled, retrying…")
+                continue
+
+            artist = suggestion.get("artist", "")
+            title = suggestion.get("title", "")
+            print(f"  Claude suggests: {artist} – {title} ({suggestion.get('year')}) [{suggestion.get('format', 'Vinyl')}]")
+
+            reason = _local_rejection(artist, title, recent_artists, owned_titles)
+            if reason is None:
+                progress(f"Checking {artist} – {title} on Discogs…")
+                future = prefetched.pop(prefetch_key(artist, title), None)
+                result = future.result() if future else discogs.search_release(artist, title)
+                reason = _release_rejection(result, owned_ids)
+            # Drop searches for anything else the stream announced; they won't be used
+            for stale in prefetched.values():
+                stale.cancel()
+            prefetched.clear()
+            if reason:
+                print(f"  Rejected '{artist} – {title}': {reason}, retrying…")
+                _log_call(purpose, attempt, call, reason)
+                progress(f"Skipped {artist} – {title}: {reason}")
+                already_suggested.append(f"{artist} – {title}")
+                continue
+
+            _log_call(purpose, attempt, call, "accepted")
+            print(f"  Fetching community stats for release {result['id']}…")
+            progress(f"Looking up rarity for {artist} – {title}…")
+            return _build_suggestion(suggestion, result)
 
     print("Could not find a valid suggestion after all attempts.")
     return None
+
+
+def get_suggestions(count: int, max_rounds: int = 2, on_progress: Callable[[str], None] | None = None) -> list[dict]:
+    """
+    Batch version of get_suggestion, used to backfill missed days. Loads the
+    profile once, asks Claude for all candidates (plus spares) in one call and
+    validates them against Discogs concurrently (still within the shared
+    Discogs rate limit). A second round is only needed if
+    too many candidates are rejected. May return fewer than `count` suggestions.
+    """
+    def progress(text: str):
+        if on_progress:
+            on_progress(text)
+
+    progress("Loading your Discogs collection…")
+    state = _load_state()
+    owned_ids = state["owned_ids"]
+    owned_titles = state["owned_titles"]
+    picks: list[dict] = []
+
+    def resolve(candidate: dict) -> tuple[dict, dict | None, str | None]:
+        # A failed lookup (e.g. HTTP 429) rejects this candidate only, not the whole batch
+        try:
+            result = discogs.search_release(candidate["artist"], candidate["title"])
+        except Exception as e:
+            return candidate, None, f"Discogs lookup failed: {e}"
+        return candidate, result, _release_rejection(result, owned_ids)
+
+    for round_ in range(1, max_rounds + 1):
+        needed = count - len(picks)
+        print(f"Asking Claude for {needed} suggestions (round {round_}/{max_rounds})…")
+        progress(f"Asking Claude for {needed} picks…")
+        # Backfilled picks stand in for daily picks, so they get the strong model
+        candidates, call = _ask_claude_batch(_context_for(state), needed + max(2, needed // 2), CLAUDE_STRONG_MODEL)
+        if call["error"]:
+            print(f"  Claude response parse error: {call['error']}")
+            _log_call("batch", round_, call, "parse error")
+            continue
+
+        to_check = []
+        for c in candidates:
+            artist, title = c.get("artist", ""), c.get("title", "")
+            reason = _local_rejection(artist, title, state["recent_artists"], owned_titles)
+            if not artist or not title or reason:
+                print(f"  Rejected '{artist} – {title}': {reason or 'incomplete'}")
+                state["already_suggested"].append(f"{artist} – {title}")
+                continue
+            to_check.append(c)
+
+        progress(f"Checking {len(to_check)} candidates on Discogs…")
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            resolved = list(executor.map(resolve, to_check))
+
+            accepted = []
+            chosen_ids = {p["discogs_id"] for p in picks}
+            for candidate, result, reason in resolved:
+                artist, title = candidate["artist"], candidate["title"]
+                if reason is None and (artist in state["recent_artists"] or result["id"] in chosen_ids):
+                    reason = "duplicate in batch"
+                if reason is None and len(picks) + len(accepted) < count:
+                    accepted.append((candidate, result))
+                    chosen_ids.add(result["id"])
+                    state["recent_artists"].append(artist)
+                elif reason:
+                    print(f"  Rejected '{artist} – {title}': {reason}")
+                state["already_suggested"].append(f"{artist} – {title}")
+
+            # Rarity is only looked up for the picks that are actually kept
+            progress(f"Looking up rarity for {len(accepted)} records…")
+            picks += executor.map(lambda pair: _build_suggestion(*pair), accepted)
+
+        _log_call("batch", round_, call, f"{len(accepted)}/{len(candidates)} accepted")
+
+        if len(picks) >= count:
+            break
+
+    print(f"Batch produced {len(picks)}/{count} suggestions.")
+    return picks
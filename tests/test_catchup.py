@@ -0,0 +1,57 @@
+import asyncio
+import datetime
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("dotenv")
+pytest.importorskip("telegram")
+
+import bot  # noqa: E402
+import config  # noqa: E402
+import database  # noqa: E402
+
+
+class FakeBot:
+    def __init__(self):
+        self.sent = []
+
+    async def send_message(self, **kwargs):
+        self.sent.append(kwargs)
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, "DB_PATH", str(tmp_path / "suggestions.db"))
+    database.init_db()
+
+
+def _pick(n: int) -> dict:
+    return {"discogs_id": str(n), "artist": f"Artist {n}", "title": f"Title {n}", "format": "Vinyl",
+            "why": "Because.", "discogs_url": f"https://www.discogs.com/release/{n}"}
+
+
+def test_catchup_before_daily_hour_leaves_today_for_the_scheduled_run(db, monkeypatch):
+    now = datetime.datetime.now(datetime.timezone.utc)
+    if (now.hour, now.minute) >= (23, 58):
+        pytest.skip("too close to midnight to schedule a later slot today")
+    # Woke up before today's scheduled time; the last pick was for the day before yesterday
+    monkeypatch.setattr(config, "DAILY_HOUR", 23)
+    monkeypatch.setattr(config, "DAILY_MINUTE", 59)
+    today = now.date()
+    database.record_suggestion("1", "Old", "Pick", slot_date=(today - datetime.timedelta(days=2)).isoformat())
+
+    picks = iter([_pick(2), _pick(3)])
+    monkeypatch.setattr(bot, "_get_suggestion", lambda on_progress=None, strong=False: next(picks))
+    context = SimpleNamespace(bot=FakeBot())
+
+    assert bot.missed_slots(now) == [today - datetime.timedelta(days=1)]
+    asyncio.run(bot.send_missed(context))
+    assert len(context.bot.sent) == 1
+    assert bot.missed_slots(now) == []
+    assert not database.suggestion_sent_today()
+
+    asyncio.run(bot.scheduled_suggestion(context))
+    assert len(context.bot.sent) == 2
+    assert database.suggestion_sent_today()
+    assert bot.missed_slots(now, include_today=True) == []